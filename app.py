@@ -1,19 +1,49 @@
 import os
+import re
 import time
 import json
+import asyncio
+import threading
 from datetime import datetime
-from flask import Flask, render_template, jsonify, request
+import orjson
+from flask import Flask, Response, render_template, jsonify, request
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
+from diskcache import Cache
 
 # Import your existing functions
 from start import (
+    CACHE_DIR,
+    PAGE_CACHE,
+    PAGE_CACHE_TTL,
+    compress_text,
+    decompress_text,
     scrape_ipo_dashboard,
-    get_page_source_with_selenium,
+    check_dashboard_validators,
+    fetch_page_source,
     parse_and_aggregate_data,
-    get_ipo_analysis_with_gemini
+    stream_ipo_analysis_with_gemini,
+    analyze_ipos_concurrently
 )
 
+class ORJSONProvider(JSONProvider):
+    """Serialize API responses with orjson instead of the stdlib json module"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS),
+            mimetype='application/json'
+        )
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 CORS(app)
 
 # Cache to store IPO data
@@ -21,60 +51,151 @@ ipo_cache = {
     'current_ipos': [],
     'upcoming_ipos': [],
     'last_updated': None,
-    'analyses': {}
+    # Dashboard ETag / Last-Modified from the last scrape, for conditional checks
+    'etag': None,
+    'last_modified': None,
+    # Persisted on disk (keyed by (ipo_type, ipo_name)) so restarts keep analyses;
+    # entries expire with the page cache so changed detail pages get re-analyzed
+    'analyses': Cache(os.path.join(CACHE_DIR, 'ipo_analyses'))
 }
 
+# Guards ipo_cache writes from request threads and the background pre-warm thread.
+# Re-entrant because refresh_ipos holds it while calling get_cached_ipos.
+cache_lock = threading.RLock()
+
+# How often the background thread re-analyzes every IPO (matches the IPO list TTL)
+PREWARM_INTERVAL = 3600
+
 def get_cached_ipos():
     """Get IPOs from cache or fetch new ones if cache is old"""
-    current_time = datetime.now()
-    
-    # Check if cache is empty or older than 1 hour
-    if (not ipo_cache['last_updated'] or 
-        (current_time - ipo_cache['last_updated']).seconds > 3600):
+    with cache_lock:
+        current_time = datetime.now()
         
-        print("Fetching fresh IPO data...")
-        current_ipos, upcoming_ipos = scrape_ipo_dashboard()
-        ipo_cache['current_ipos'] = current_ipos if current_ipos else []
-        ipo_cache['upcoming_ipos'] = upcoming_ipos if upcoming_ipos else []
-        ipo_cache['last_updated'] = current_time
+        # Check if cache is empty or older than 1 hour
+        if (not ipo_cache['last_updated'] or 
+            (current_time - ipo_cache['last_updated']).seconds > 3600):
+        
+            # Skip the scrape entirely if the dashboard hasn't changed since last time
+            # (only possible once a previous scrape left us validators to send)
+            if ipo_cache['etag'] or ipo_cache['last_modified']:
+                not_modified, _, _ = check_dashboard_validators(
+                    ipo_cache['etag'], ipo_cache['last_modified']
+                )
+            else:
+                not_modified = False
+            if not_modified and ipo_cache['last_updated']:
+                print("IPO dashboard unchanged, keeping cached IPO data.")
+                ipo_cache['last_updated'] = current_time
+                return ipo_cache['current_ipos'], ipo_cache['upcoming_ipos']
+        
+            print("Fetching fresh IPO data...")
+            validators = {}
+            current_ipos, upcoming_ipos = scrape_ipo_dashboard(validators)
+            ipo_cache['current_ipos'] = current_ipos if current_ipos else []
+            ipo_cache['upcoming_ipos'] = upcoming_ipos if upcoming_ipos else []
+            ipo_cache['last_updated'] = current_time
+            ipo_cache['etag'] = validators.get('etag')
+            ipo_cache['last_modified'] = validators.get('last_modified')
+        
+        return ipo_cache['current_ipos'], ipo_cache['upcoming_ipos']
+
+# Section headers are either "**Section Name:**" lines or lines starting "1." - "6."
+SECTION_RE = re.compile(
+    r'^[ \t]*(?:\*\*(?P<bold>.+?):\*\*|(?P<num>[1-6])\.(?P<num_title>.*?))[ \t\r]*$',
+    re.M
+)
+# Strips each line of a section body and drops the blank ones
+LINE_BREAKS_RE = re.compile(r'\s*\n\s*')
+# Markdown emphasis and colons removed from section titles
+TITLE_NOISE_RE = re.compile(r'[*:]')
+# Section number left on bold headers like "**1. IPO Snapshot:**"
+TITLE_NUMBER_RE = re.compile(r'^[1-6]\.\s*')
+
+def iter_analysis_sections(analysis_text, matches, complete=True):
+    """
+    Yield (title, content) for each section header in `matches`.
+    With complete=False the last section may still be streaming in, so it is held back.
+    """
+    ends = [match.start() for match in matches[1:]] + [len(analysis_text)]
+    if not complete:
+        matches, ends = matches[:-1], ends[:-1]
+    
+    for match, end in zip(matches, ends):
+        if match.group('bold') is not None:
+            title = TITLE_NUMBER_RE.sub('', TITLE_NOISE_RE.sub('', match.group('bold')).strip())
+        else:
+            title = TITLE_NOISE_RE.sub('', match.group('num_title')).strip()
+        if not title:
+            continue
         
-    return ipo_cache['current_ipos'], ipo_cache['upcoming_ipos']
+        # Section content runs until the next header (or the end of the text)
+        yield title, LINE_BREAKS_RE.sub('\n', analysis_text[match.end():end].strip())
 
 def parse_analysis_sections(analysis_text):
     """Parse the Gemini analysis into structured sections"""
-    sections = {}
+    return dict(iter_analysis_sections(analysis_text, list(SECTION_RE.finditer(analysis_text))))
+
+def sse_event(event, payload):
+    """Format a Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {app.json.dumps(payload)}\n\n"
+
+def build_analysis_data(ipo, ipo_type, type_label, analysis_text):
+    """Build the cached/returned payload for an analyzed IPO"""
+    return {
+        'ipo': ipo,
+        'ipo_type': ipo_type,
+        'type_label': type_label,
+        'raw_analysis': analysis_text,
+        'sections': parse_analysis_sections(analysis_text),
+        'analyzed_at': datetime.now().isoformat()
+    }
+
+def store_analysis(ipo_key, analysis_data):
+    """Cache an analysis with its raw text compressed; sections are re-derived on read"""
+    stored = {key: value for key, value in analysis_data.items() if key != 'sections'}
+    stored['raw_analysis'] = compress_text(analysis_data['raw_analysis'])
+    with cache_lock:
+        ipo_cache['analyses'].set(ipo_key, stored, expire=PAGE_CACHE_TTL)
+
+def load_analysis(ipo_key):
+    """Read a cached analysis back into the full payload (None if missing or expired)"""
+    stored = ipo_cache['analyses'].get(ipo_key)
+    if stored is None:
+        return None
+    analysis_data = dict(stored)
+    analysis_data['raw_analysis'] = decompress_text(analysis_data['raw_analysis'])
+    analysis_data['sections'] = parse_analysis_sections(analysis_data['raw_analysis'])
+    return analysis_data
+
+async def prewarm_analyses(current_ipos, upcoming_ipos):
+    """
+    Analyze every IPO concurrently and store the results in the cache.
+    Every IPO is re-analyzed on each pass so stored analyses track page updates;
+    unchanged pages are answered from the prompt cache without a Gemini call.
+    """
+    labelled = [('current', 'CURRENT', index, ipo) for index, ipo in enumerate(current_ipos)] + \
+               [('upcoming', 'UPCOMING', index, ipo) for index, ipo in enumerate(upcoming_ipos)]
     
-    # Split by numbered sections
-    lines = analysis_text.split('\n')
-    current_section = None
-    current_content = []
+    analyses = await analyze_ipos_concurrently([ipo for _, _, _, ipo in labelled])
     
-    for line in lines:
-        line = line.strip()
-        if not line:
+    analyzed = 0
+    for (ipo_type, type_label, ipo_index, ipo), analysis_text in zip(labelled, analyses):
+        if not analysis_text:
             continue
-            
-        # Check for section headers (1., 2., etc. or **Section Name:**)
-        if (line.startswith('**') and line.endswith(':**')) or \
-           (line.startswith(('1.', '2.', '3.', '4.', '5.', '6.'))):
-            
-            # Save previous section
-            if current_section:
-                sections[current_section] = '\n'.join(current_content)
-            
-            # Start new section
-            current_section = line.replace('*', '').replace(':', '').strip()
-            if current_section.startswith(('1.', '2.', '3.', '4.', '5.', '6.')):
-                current_section = current_section[2:].strip()
-            current_content = []
-        else:
-            current_content.append(line)
-    
-    # Save last section
-    if current_section:
-        sections[current_section] = '\n'.join(current_content)
-    
-    return sections
+        store_analysis((ipo_type, ipo['name']), build_analysis_data(ipo, ipo_type, type_label, analysis_text))
+        analyzed += 1
+    return analyzed
+
+def prewarm_all():
+    """Background loop: analyze every IPO at startup and again every PREWARM_INTERVAL seconds"""
+    while True:
+        try:
+            current_ipos, upcoming_ipos = get_cached_ipos()
+            analyzed_count = asyncio.run(prewarm_analyses(current_ipos, upcoming_ipos))
+            print(f"Pre-warmed {analyzed_count} IPO analyses.")
+        except Exception as e:
+            print(f"Error pre-warming IPO analyses: {e}")
+        time.sleep(PREWARM_INTERVAL)
 
 @app.route('/')
 def index():
@@ -103,7 +224,11 @@ def get_ipos():
 
 @app.route('/api/ipo/<ipo_type>/<int:ipo_index>/analyze')
 def analyze_ipo(ipo_type, ipo_index):
-    """API endpoint to analyze a specific IPO"""
+    """
+    API endpoint to analyze a specific IPO.
+    Cached analyses come back as JSON; fresh ones are streamed as Server-Sent Events:
+    a `section` event per finished section, then `done` (full data) or `error`.
+    """
     try:
         current_ipos, upcoming_ipos = get_cached_ipos()
         
@@ -127,76 +252,105 @@ def analyze_ipo(ipo_type, ipo_index):
             }), 400
         
         ipo = ipos[ipo_index]
-        ipo_key = f"{ipo_type}_{ipo_index}_{ipo['name']}"
+        ipo_key = (ipo_type, ipo['name'])
         
         # Check if analysis is already cached
-        if ipo_key in ipo_cache['analyses']:
+        cached_analysis = load_analysis(ipo_key)
+        if cached_analysis is not None:
             return jsonify({
                 'success': True,
-                'data': ipo_cache['analyses'][ipo_key]
+                'data': cached_analysis
             })
         
-        # Perform analysis
-        print(f"Analyzing {type_label} IPO: {ipo['name']}")
-        
-        html_content = get_page_source_with_selenium(ipo['url'])
-        if not html_content:
-            return jsonify({
-                'success': False,
-                'error': 'Could not retrieve IPO details page'
-            }), 500
-        
-        aggregated_data = parse_and_aggregate_data(html_content)
-        if not aggregated_data:
-            return jsonify({
-                'success': False,
-                'error': 'Could not parse IPO data from the page'
-            }), 500
-        
-        analysis_text = get_ipo_analysis_with_gemini(aggregated_data)
-        analysis_sections = parse_analysis_sections(analysis_text)
-        
-        # Cache the analysis
-        analysis_data = {
-            'ipo': ipo,
-            'ipo_type': ipo_type,
-            'type_label': type_label,
-            'raw_analysis': analysis_text,
-            'sections': analysis_sections,
-            'analyzed_at': datetime.now().isoformat()
-        }
-        
-        ipo_cache['analyses'][ipo_key] = analysis_data
-        
-        return jsonify({
-            'success': True,
-            'data': analysis_data
-        })
-        
     except Exception as e:
         print(f"Error analyzing IPO: {e}")
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
+    
+    def generate():
+        try:
+            # Perform analysis
+            print(f"Analyzing {type_label} IPO: {ipo['name']}")
+            
+            html_content = asyncio.run(fetch_page_source(ipo['url']))
+            if not html_content:
+                yield sse_event('error', {'success': False, 'error': 'Could not retrieve IPO details page'})
+                return
+            
+            aggregated_data = parse_and_aggregate_data(html_content)
+            if not aggregated_data:
+                yield sse_event('error', {'success': False, 'error': 'Could not parse IPO data from the page'})
+                return
+            
+            # Flush each section as soon as the header of the next one arrives. Only
+            # complete lines are scanned: a chunk that stops right after an inline
+            # label like "**Issue Size:**" would otherwise look like a header.
+            # `pending` only keeps text from the still-open section's header onward,
+            # so each chunk rescans one section rather than the whole analysis.
+            chunks = []
+            pending = ""
+            for chunk in stream_ipo_analysis_with_gemini(aggregated_data):
+                chunks.append(chunk)
+                pending += chunk
+                complete_lines_end = pending.rfind('\n') + 1
+                matches = list(SECTION_RE.finditer(pending, 0, complete_lines_end))
+                for title, content in iter_analysis_sections(pending, matches, complete=False):
+                    yield sse_event('section', {'title': title, 'content': content})
+                # Before the first header, complete lines are preamble and can go too
+                pending = pending[matches[-1].start() if matches else complete_lines_end:]
+            
+            analysis_text = "".join(chunks).strip()
+            if not analysis_text:
+                yield sse_event('error', {'success': False, 'error': 'The AI analyst returned an empty analysis'})
+                return
+            
+            for title, content in iter_analysis_sections(pending, list(SECTION_RE.finditer(pending))):
+                yield sse_event('section', {'title': title, 'content': content})
+            
+            # Cache the analysis
+            analysis_data = build_analysis_data(ipo, ipo_type, type_label, analysis_text)
+            store_analysis(ipo_key, analysis_data)
+            
+            yield sse_event('done', {'success': True, 'data': analysis_data})
+            
+        except Exception as e:
+            print(f"Error analyzing IPO: {e}")
+            yield sse_event('error', {'success': False, 'error': str(e)})
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 @app.route('/api/refresh')
-def refresh_ipos():
-    """Force refresh IPO data"""
+async def refresh_ipos():
+    """Force refresh IPO data (pass ?prewarm=1 to also analyze every IPO)"""
     try:
-        ipo_cache['current_ipos'] = []
-        ipo_cache['upcoming_ipos'] = []
-        ipo_cache['last_updated'] = None
-        ipo_cache['analyses'] = {}
+        with cache_lock:
+            ipo_cache['current_ipos'] = []
+            ipo_cache['upcoming_ipos'] = []
+            ipo_cache['last_updated'] = None
+            ipo_cache['etag'] = None
+            ipo_cache['last_modified'] = None
+            ipo_cache['analyses'].clear()
+            # Drop cached detail pages too so the next analysis re-fetches them
+            PAGE_CACHE.clear()
+            
+            current_ipos, upcoming_ipos = get_cached_ipos()
         
-        current_ipos, upcoming_ipos = get_cached_ipos()
+        analyzed_count = 0
+        if request.args.get('prewarm') in ('1', 'true'):
+            analyzed_count = await prewarm_analyses(current_ipos, upcoming_ipos)
         
         return jsonify({
             'success': True,
             'message': 'IPO data refreshed successfully',
             'current_count': len(current_ipos),
             'upcoming_count': len(upcoming_ipos),
-            'total_count': len(current_ipos) + len(upcoming_ipos)
+            'total_count': len(current_ipos) + len(upcoming_ipos),
+            'analyzed_count': analyzed_count
         })
     except Exception as e:
         return jsonify({
@@ -209,4 +363,9 @@ if __name__ == '__main__':
     os.makedirs('templates', exist_ok=True)
     os.makedirs('static', exist_ok=True)
     
+    # The debug reloader also runs this block in its watcher process; only the
+    # serving process should pre-warm, so the first user gets a cache hit.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        threading.Thread(target=prewarm_all, daemon=True).start()
+    
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
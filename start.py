@@ -1,9 +1,22 @@
 import os
-import time
+import zlib
+import json
+import hashlib
+import atexit
+import multiprocessing
+import asyncio
+import threading
+from typing import TypedDict
+from functools import lru_cache
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 # --- Third-party Library Imports ---
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from selectolax.lexbor import LexborHTMLParser
 from dotenv import load_dotenv
+import httpx
+from diskcache import Cache
 
 # --- LLM and Web Scraping Imports ---
 import google.generativeai as genai
@@ -32,46 +45,255 @@ try:
 except Exception as e:
     print(f"Error configuring Google AI SDK: {e}")
 
-# ==============================================================================
-# WORKER FUNCTION 1: SCRAPE THE IPO DASHBOARD (The "Librarian")
-# ==============================================================================
-def scrape_ipo_dashboard():
+# One shared model instance so every call reuses its client and connection
+GEMINI_MODEL_NAME = "gemini-2.5-flash"
+_GEMINI_MODEL = genai.GenerativeModel(GEMINI_MODEL_NAME)
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+
+DASHBOARD_URL = "https://www.chittorgarh.com/ipo/ipo_dashboard.asp"
+DASHBOARD_MARKER = "Current IPOs (Mainboard)"
+HTTP_HEADERS = {"User-Agent": USER_AGENT}
+HTTP_TIMEOUT = 20
+
+# Tags that start a new section on a detail page
+SECTION_HEADER_TAGS = frozenset(('h2', 'h3'))
+
+# --- Persistent caches ---
+# Detail pages are kept for an hour; Gemini analyses are keyed by a hash of the
+# exact prompt, so they stay valid for as long as the page content doesn't change.
+CACHE_DIR = os.getenv("AIPOLYTICS_CACHE_DIR", "cache")
+PAGE_CACHE_TTL = 3600
+PAGE_CACHE = Cache(os.path.join(CACHE_DIR, "pages"))
+ANALYSIS_CACHE = Cache(os.path.join(CACHE_DIR, "analysis"))
+
+def compress_text(text):
+    """zlib-compresses text for storage in a cache (HTML and analyses shrink 3-6x)."""
+    return zlib.compress(text.encode("utf-8"), 3)
+
+def decompress_text(blob):
+    """Inverse of compress_text."""
+    return zlib.decompress(blob).decode("utf-8")
+
+def prompt_cache_key(prompt):
+    """Content hash used to look up a previous Gemini answer for `prompt`."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+def get_cached_analysis(cache_key):
+    """Previous Gemini answer stored under `cache_key`, or None."""
+    blob = ANALYSIS_CACHE.get(cache_key)
+    return None if blob is None else decompress_text(blob)
+
+def set_cached_analysis(cache_key, analysis):
+    """Stores a Gemini answer compressed, like the page cache."""
+    ANALYSIS_CACHE.set(cache_key, compress_text(analysis))
+
+ANALYSIS_STRUCTURE = """
+    1.  **IPO Snapshot:** Briefly list the Issue Size, Price Band, and Dates.
+    2.  **Business Overview:** A one or two-sentence summary of what the company does.
+    3.  **Financial Health:** Briefly comment on the company's financial performance (revenue/profit trends) based on the data.
+    4.  **Positive Indicators (Reasons to consider applying):** Create a bulleted list of positive points.
+    5.  **Negative Indicators (Reasons for caution):** Create a bulleted list of negative points.
+    6.  **Final Verdict:** Conclude with a balanced, one-paragraph verdict based *strictly* on the provided information. Start with "Based on the available data...".
+"""
+
+ANALYSIS_PROMPT_TEMPLATE = """
+    You are an expert IPO analyst with immense stock market knowledge, providing a summary for a retail investor. Based ONLY on the text provided below, generate a comprehensive analysis of the IPO. Structure your response as follows:""" + ANALYSIS_STRUCTURE + """
+    --- IPO DATA START ---
+    {ipo_data_text}
+    --- IPO DATA END ---
     """
-    Scrapes the main IPO dashboard to get a list of upcoming IPOs and their links.
-    ** This function now uses Selenium to bypass anti-scraping measures. **
+
+BATCH_ANALYSIS_PROMPT_TEMPLATE = """
+    You are an expert IPO analyst with immense stock market knowledge, providing summaries for a retail investor. Below are several IPOs, each wrapped in <IPO id="..."> tags. For EACH IPO, based ONLY on the text inside its own tags, generate a comprehensive analysis of that IPO. Structure every analysis as follows:""" + ANALYSIS_STRUCTURE + """
+    Return a JSON array with exactly one object per IPO, where "id" is the IPO's id and "analysis" is the full analysis text in the structure above.
+
+    {ipo_blocks}
     """
-    print("Step 1: Scraping the IPO Dashboard for upcoming IPOs...")
-    url = "https://www.chittorgarh.com/ipo/ipo_dashboard.asp"
-    upcoming_ipos = []
-    current_ipos = []
-    
-    # --- Using Selenium for the dashboard ---
+
+# Keeps each batched prompt (and its JSON response) to a manageable size
+BATCH_MAX_IPOS = 8
+
+class IPOAnalysisResult(TypedDict):
+    id: int
+    analysis: str
+
+# ==============================================================================
+# BROWSER POOL (long-lived headless Chrome instances shared by all scrapes)
+# ==============================================================================
+def build_chrome_options():
+    """Options for the headless Chrome instances used by the scrapers."""
     chrome_options = Options()
     chrome_options.add_argument("--headless")
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36")
-    
-    driver = webdriver.Chrome(options=chrome_options)
+    chrome_options.add_argument(f"user-agent={USER_AGENT}")
+    # We only read the HTML, so don't download images or wait for the full load event
+    chrome_options.page_load_strategy = 'eager'
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_experimental_option('prefs', {
+        'profile.managed_default_content_settings.images': 2,
+        'profile.default_content_setting_values.notifications': 2,
+    })
+    return chrome_options
 
-    try:
+class DriverPool:
+    """
+    Keeps up to `size` headless Chrome drivers alive between scrapes so we only
+    pay Chrome's startup cost once per driver. Drivers are created on demand
+    (Chrome is only the fallback fetcher) and wiped clean when they're handed back.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._idle = []
+        self._drivers = []
+        self._spawned = 0
+        # Signalled whenever a driver is handed back or a slot frees up
+        self._available = threading.Condition()
+
+    def _checkout(self):
+        with self._available:
+            while not self._idle and self._spawned >= self.size:
+                self._available.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._spawned += 1  # claim the slot while Chrome starts
+        try:
+            driver = webdriver.Chrome(options=build_chrome_options())
+        except Exception:
+            with self._available:
+                self._spawned -= 1
+                self._available.notify()
+            raise
+        with self._available:
+            self._drivers.append(driver)
+        return driver
+
+    def _discard(self, driver):
+        with self._available:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+                self._spawned -= 1
+            if driver in self._idle:
+                self._idle.remove(driver)
+            # Wake a waiter so it can spawn a replacement in the freed slot
+            self._available.notify()
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    @contextmanager
+    def acquire(self):
+        """Check out a driver, blocking if all of them are busy."""
+        driver = self._checkout()
+        try:
+            yield driver
+        finally:
+            try:
+                driver.delete_all_cookies()
+                driver.get('about:blank')
+            except Exception:
+                # The browser died mid-job (a dead chromedriver usually surfaces as a
+                # urllib3 error, not WebDriverException); drop it so a fresh one gets spawned
+                self._discard(driver)
+            else:
+                with self._available:
+                    self._idle.append(driver)
+                    self._available.notify()
+
+    def shutdown(self):
+        """Quit every driver the pool has started."""
+        with self._available:
+            drivers = list(self._drivers)
+        for driver in drivers:
+            self._discard(driver)
+
+DRIVER_POOL = DriverPool(min(4, os.cpu_count() or 1))
+atexit.register(DRIVER_POOL.shutdown)
+
+# ==============================================================================
+# WORKER FUNCTION 1: SCRAPE THE IPO DASHBOARD (The "Librarian")
+# ==============================================================================
+def get_dashboard_source_with_selenium():
+    """Uses a pooled Selenium browser to get the dashboard HTML past anti-scraping checks."""
+    with DRIVER_POOL.acquire() as driver:
         print("Navigating to dashboard with robot browser...")
-        driver.get(url)
+        driver.get(DASHBOARD_URL)
         
         # Wait for the mainboard IPO table header to be present
         WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.XPATH, "//h2[contains(text(), 'Current IPOs (Mainboard)')]"))
+            EC.presence_of_element_located((By.XPATH, f"//h2[contains(text(), '{DASHBOARD_MARKER}')]"))
         )
         print("Dashboard loaded successfully.")
+        return driver.page_source
+
+def fetch_dashboard_html(validators=None):
+    """
+    Gets the dashboard HTML with a plain HTTP request. The tables are rendered
+    server-side, so the robot browser is only needed if the request is blocked.
+    If a `validators` dict is passed, it is filled with the response's ETag /
+    Last-Modified headers for later conditional checks.
+    """
+    try:
+        with httpx.Client(http2=True, headers=HTTP_HEADERS, timeout=HTTP_TIMEOUT, follow_redirects=True) as client:
+            response = client.get(DASHBOARD_URL)
+        if response.status_code == 200 and DASHBOARD_MARKER in response.text:
+            print("Dashboard loaded successfully.")
+            if validators is not None:
+                validators["etag"] = response.headers.get("ETag")
+                validators["last_modified"] = response.headers.get("Last-Modified")
+            return response.text
+        print(f"Dashboard not usable over HTTP (status {response.status_code}), falling back to robot browser.")
+    except httpx.HTTPError as e:
+        print(f"HTTP fetch failed ({e}), falling back to robot browser.")
+    return get_dashboard_source_with_selenium()
+
+def check_dashboard_validators(etag=None, last_modified=None):
+    """
+    Sends a cheap conditional HEAD request for the dashboard.
+    Returns (not_modified, etag, last_modified) where the validators are the
+    server's current ETag / Last-Modified headers (None if unavailable).
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    try:
+        response = httpx.head(DASHBOARD_URL, headers={**HTTP_HEADERS, **headers},
+                              timeout=HTTP_TIMEOUT, follow_redirects=True)
+    except httpx.HTTPError as e:
+        print(f"Could not check whether the dashboard changed ({e}).")
+        return False, None, None
+    if response.status_code == 304:
+        return True, etag, last_modified
+    return False, response.headers.get("ETag"), response.headers.get("Last-Modified")
+
+def scrape_ipo_dashboard(validators=None):
+    """
+    Scrapes the main IPO dashboard to get a list of upcoming IPOs and their links.
+    ** Falls back to Selenium only when plain HTTP is blocked by anti-scraping measures. **
+    `validators`, if given, receives the dashboard's ETag / Last-Modified (see fetch_dashboard_html).
+    """
+    print("Step 1: Scraping the IPO Dashboard for upcoming IPOs...")
+    upcoming_ipos = []
+    current_ipos = []
+    
+    try:
+        html_content = fetch_dashboard_html(validators)
         
-        # Get the page source and parse with BeautifulSoup
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        
-        mainboard_header = soup.find('h2', string=lambda text: 'Current IPOs (Mainboard)' in text)
+        # Parse with BeautifulSoup, keeping only the headers and tables we actually look at
+        strainer = SoupStrainer(['h2', 'table'])
+        soup = BeautifulSoup(html_content, 'lxml', parse_only=strainer)
+    
+        mainboard_header = soup.find('h2', string=lambda text: DASHBOARD_MARKER in text)
         if not mainboard_header:
             print("Could not find the 'Current IPOs (Mainboard)' table header.")
             return []
-            
+        
         ipo_table = mainboard_header.find_next('table')
         if not ipo_table:
             print("Could not find the table following the header.")
@@ -100,7 +322,7 @@ def scrape_ipo_dashboard():
                     if link_tag and link_tag.has_attr('href'):
                         relative_url = link_tag['href']
                         full_url = f"https://www.chittorgarh.com{relative_url}"
-                        
+                    
                         upcoming_ipos.append({
                             "name": company_name,
                             "url": full_url,
@@ -108,7 +330,7 @@ def scrape_ipo_dashboard():
                 else:
                     continue
 
-        
+    
         print(f"Found {len(upcoming_ipos)} upcoming Mainboard IPOs.")
         print("Name of first current ipo:", current_ipos[0]['name'] if current_ipos else "No current IPOs found")
         print(f"Found {len(current_ipos)} current Mainboard IPOs")
@@ -118,75 +340,267 @@ def scrape_ipo_dashboard():
     except Exception as e:
         print(f"An error occurred while scraping the dashboard: {e}")
         return []
-    finally:
-        driver.quit()
 
 # ==============================================================================
 # WORKER FUNCTIONS 2, 3, 4 (The Analysis Pipeline - No Changes Needed)
 # ==============================================================================
 def get_page_source_with_selenium(url):
     """Uses Selenium to get the full HTML of a detailed IPO page."""
+    cached_html = PAGE_CACHE.get(url)
+    if cached_html is not None:
+        print(f"\nStep 2: Using cached detail page -> {url}")
+        return decompress_text(cached_html)
+
     print(f"\nStep 2: Visiting detail page with Robot Browser -> {url}")
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36")
-    driver = webdriver.Chrome(options=chrome_options)
-    try:
-        driver.get(url)
-        print("Waiting for main content div (id='main') to load...")
-        WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.ID, "main")))
-        print("Page content loaded successfully.")
-        return driver.page_source
-    except TimeoutException:
-        print("\n--- ERROR: Timed out waiting for the element with id='main'. This IPO may not have a detailed report yet.")
-        return None
-    finally:
-        driver.quit()
+    with DRIVER_POOL.acquire() as driver:
+        try:
+            driver.get(url)
+            print("Waiting for main content div (id='main') to load...")
+            WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.ID, "main")))
+            print("Page content loaded successfully.")
+            html_content = driver.page_source
+            PAGE_CACHE.set(url, compress_text(html_content), expire=PAGE_CACHE_TTL)
+            return html_content
+        except TimeoutException:
+            print("\n--- ERROR: Timed out waiting for the element with id='main'. This IPO may not have a detailed report yet.")
+            return None
 
 def parse_and_aggregate_data(html_content):
-    """Uses BeautifulSoup to parse the detailed HTML."""
+    """Uses selectolax (lexbor) to parse the detailed HTML."""
     print("Step 3: Parsing HTML with the Detective...")
-    soup = BeautifulSoup(html_content, 'html.parser')
-    main_content = soup.find('div', id='main')
+    tree = LexborHTMLParser(html_content)
+    main_content = tree.css_first('div#main')
     if not main_content: return None
-    aggregated_text = ""
-    for header in main_content.find_all(['h2', 'h3']):
-        if "Message Board" in header.get_text(): continue
-        aggregated_text += f"\n\n--- Section: {header.get_text(strip=True)} ---\n"
-        content = ""
-        for sibling in header.find_next_siblings():
-            if sibling.name in ['h2', 'h3']: break
-            content += sibling.get_text(separator=' ', strip=True) + " "
-        aggregated_text += content
-    return aggregated_text.strip()
+    # .text() would include script/style/template contents, which get_text() skipped
+    main_content.strip_tags(['script', 'style', 'template'], recursive=True)
+    # Collect pieces in lists and join once; repeated str += is quadratic on big pages
+    parts = []
+    for header in main_content.css('h2, h3'):
+        if "Message Board" in header.text(): continue
+        parts.append(f"\n\n--- Section: {header.text(strip=True)} ---\n")
+        content = []
+        sibling = header.next
+        while sibling is not None:
+            # Text and comment nodes carry pseudo tags like "-text" / "!comment"
+            if not sibling.tag.startswith(('-', '!')):
+                if sibling.tag in SECTION_HEADER_TAGS: break
+                content.append(sibling.text(separator=' ', strip=True))
+                content.append(" ")
+            sibling = sibling.next
+        parts.append("".join(content))
+    return "".join(parts).strip()
 
 def get_ipo_analysis_with_gemini(ipo_data_text):
     """Sends the data to Gemini for analysis."""
     print("Step 4: Sending data to the AI Analyst (Gemini)...")
-    prompt = f"""
-    You are an expert IPO analyst with immense stock market knowledge, providing a summary for a retail investor. Based ONLY on the text provided below, generate a comprehensive analysis of the IPO. Structure your response as follows:
-    1.  **IPO Snapshot:** Briefly list the Issue Size, Price Band, and Dates.
-    2.  **Business Overview:** A one or two-sentence summary of what the company does.
-    3.  **Financial Health:** Briefly comment on the company's financial performance (revenue/profit trends) based on the data.
-    4.  **Positive Indicators (Reasons to consider applying):** Create a bulleted list of positive points.
-    5.  **Negative Indicators (Reasons for caution):** Create a bulleted list of negative points.
-    6.  **Final Verdict:** Conclude with a balanced, one-paragraph verdict based *strictly* on the provided information. Start with "Based on the available data...".
+    prompt = ANALYSIS_PROMPT_TEMPLATE.format(ipo_data_text=ipo_data_text)
+    cache_key = prompt_cache_key(prompt)
+    cached_analysis = get_cached_analysis(cache_key)
+    if cached_analysis is not None:
+        print("Using cached analysis for unchanged IPO data.")
+        return cached_analysis
+    try:
+        response = _GEMINI_MODEL.generate_content(prompt)
+        analysis = response.text.strip()
+        set_cached_analysis(cache_key, analysis)
+        return analysis
+    except Exception as e:
+        return f"An error occurred while communicating with the Google AI API: {e}"
 
-    --- IPO DATA START ---
-    {ipo_data_text}
-    --- IPO DATA END ---
+def stream_ipo_analysis_with_gemini(ipo_data_text):
+    """
+    Sends the data to Gemini and yields the analysis text as it is generated.
+    The complete analysis is cached once the stream finishes (unless it came back
+    empty, e.g. a safety block); errors are raised.
     """
+    print("Step 4: Streaming data to the AI Analyst (Gemini)...")
+    prompt = ANALYSIS_PROMPT_TEMPLATE.format(ipo_data_text=ipo_data_text)
+    cache_key = prompt_cache_key(prompt)
+    cached_analysis = get_cached_analysis(cache_key)
+    if cached_analysis is not None:
+        print("Using cached analysis for unchanged IPO data.")
+        yield cached_analysis
+        return
+
+    chunks = []
+    for chunk in _GEMINI_MODEL.generate_content(prompt, stream=True):
+        if not chunk.parts:
+            continue
+        chunks.append(chunk.text)
+        yield chunk.text
+    analysis = "".join(chunks).strip()
+    if analysis:
+        set_cached_analysis(cache_key, analysis)
+
+# ==============================================================================
+# ASYNC PIPELINE (concurrent fetch + analysis for the web app)
+# ==============================================================================
+# Worker processes for HTML parsing in batch runs, so parses aren't serialized
+# by the GIL. Workers are only started when the first parse is submitted, and
+# come from a fresh interpreter (forkserver/spawn) rather than a fork of the
+# multithreaded web server, which could inherit a held stdout or sqlite lock.
+_PARSE_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+PARSE_POOL = ProcessPoolExecutor(
+    max_workers=min(4, os.cpu_count() or 1),
+    mp_context=multiprocessing.get_context(_PARSE_START_METHOD),
+)
+atexit.register(PARSE_POOL.shutdown, cancel_futures=True)
+
+# Detail pages render #main server-side, so its presence in the raw HTML means
+# we don't need a browser for that page.
+def has_main_div(html_content):
+    """True if the page has the div#main that parse_and_aggregate_data reads."""
+    return LexborHTMLParser(html_content).css_first('div#main') is not None
+
+async def fetch_page_source(url, client=None):
+    """
+    Fetches a detailed IPO page over plain HTTP.
+    Falls back to the Selenium robot browser if the request is blocked or #main
+    isn't in the raw response.
+    """
+    cached_html = PAGE_CACHE.get(url)
+    if cached_html is not None:
+        print(f"\nStep 2: Using cached detail page -> {url}")
+        return decompress_text(cached_html)
+
+    if client is None:
+        async with httpx.AsyncClient(http2=True, headers=HTTP_HEADERS, timeout=HTTP_TIMEOUT, follow_redirects=True) as client:
+            return await fetch_page_source(url, client)
+
+    print(f"\nStep 2: Fetching detail page -> {url}")
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        response = await client.get(url)
+        if response.status_code == 200 and has_main_div(response.text):
+            PAGE_CACHE.set(url, compress_text(response.text), expire=PAGE_CACHE_TTL)
+            return response.text
+        print(f"Detail page not usable over HTTP (status {response.status_code}), falling back to robot browser.")
+    except httpx.HTTPError as e:
+        print(f"HTTP fetch failed ({e}), falling back to robot browser.")
+    return await asyncio.to_thread(get_page_source_with_selenium, url)
+
+async def get_ipo_analysis_with_gemini_async(ipo_data_text):
+    """
+    Sends the data to Gemini for analysis without blocking the event loop.
+    Uses the sync client in a worker thread: the SDK's async client is bound to the
+    first event loop that uses it, and callers here each run their own loop.
+    Returns None on failure so callers don't mistake an error message for an analysis.
+    """
+    print("Step 4: Sending data to the AI Analyst (Gemini)...")
+    prompt = ANALYSIS_PROMPT_TEMPLATE.format(ipo_data_text=ipo_data_text)
+    cache_key = prompt_cache_key(prompt)
+    cached_analysis = get_cached_analysis(cache_key)
+    if cached_analysis is not None:
+        print("Using cached analysis for unchanged IPO data.")
+        return cached_analysis
+    try:
+        response = await asyncio.to_thread(_GEMINI_MODEL.generate_content, prompt)
+        analysis = response.text.strip()
+        set_cached_analysis(cache_key, analysis)
+        return analysis
     except Exception as e:
-        return f"An error occurred while communicating with the Google AI API: {e}"
-    
+        print(f"An error occurred while communicating with the Google AI API: {e}")
+        return None
+
+async def get_ipo_analysis_batch(ipo_texts):
+    """
+    Analyzes several IPOs with as few Gemini calls as possible.
+    Each IPO is wrapped in <IPO id="k"> tags and Gemini answers with a JSON array
+    of {id, analysis}; results are cached under the same keys as single analyses.
+    Returns analyses in the same order as `ipo_texts` (None where Gemini failed).
+    """
+    analyses = [None] * len(ipo_texts)
+    cache_keys = [prompt_cache_key(ANALYSIS_PROMPT_TEMPLATE.format(ipo_data_text=text)) for text in ipo_texts]
+
+    pending = []
+    for index, cache_key in enumerate(cache_keys):
+        analyses[index] = get_cached_analysis(cache_key)
+        if analyses[index] is None:
+            pending.append(index)
+    if not pending:
+        return analyses
+
+    async def run_batch(batch):
+        print(f"Step 4: Sending {len(batch)} IPO(s) to the AI Analyst (Gemini) in one request...")
+        ipo_blocks = "\n\n".join(
+            f'<IPO id="{batch_id}">\n{ipo_texts[index]}\n</IPO>' for batch_id, index in enumerate(batch)
+        )
+        prompt = BATCH_ANALYSIS_PROMPT_TEMPLATE.format(ipo_blocks=ipo_blocks)
+        try:
+            response = await asyncio.to_thread(
+                _GEMINI_MODEL.generate_content,
+                prompt,
+                generation_config=genai.GenerationConfig(
+                    response_mime_type="application/json",
+                    response_schema=list[IPOAnalysisResult],
+                ),
+            )
+            for result in json.loads(response.text):
+                batch_id = result.get('id')
+                analysis = (result.get('analysis') or '').strip()
+                if isinstance(batch_id, int) and 0 <= batch_id < len(batch) and analysis:
+                    index = batch[batch_id]
+                    analyses[index] = analysis
+                    set_cached_analysis(cache_keys[index], analysis)
+        except Exception as e:
+            print(f"Batched Gemini request failed ({e}), analyzing those IPOs one by one.")
+
+        # Anything the batch didn't cover gets a regular single-IPO request
+        missing = [index for index in batch if analyses[index] is None]
+        singles = await asyncio.gather(*[get_ipo_analysis_with_gemini_async(ipo_texts[index]) for index in missing])
+        for index, analysis in zip(missing, singles):
+            analyses[index] = analysis
+
+    batches = [pending[start:start + BATCH_MAX_IPOS] for start in range(0, len(pending), BATCH_MAX_IPOS)]
+    await asyncio.gather(*[run_batch(batch) for batch in batches])
+    return analyses
+
+async def collect_ipo_data_async(ipo, client=None):
+    """Runs fetch -> parse for one IPO. Returns the aggregated text, or None."""
+    html_content = await fetch_page_source(ipo['url'], client)
+    if not html_content:
+        return None
+    # Parsing is CPU-bound, so hand it to the process pool instead of blocking the event loop
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(PARSE_POOL, parse_and_aggregate_data, html_content)
+
+async def analyze_ipos_concurrently(ipos):
+    """
+    Fetches and parses several IPOs at once, then analyzes them in batched Gemini calls.
+    Returns analyses in the same order as `ipos` (None on failure).
+    """
+    # Same politeness limit as the CLI runner: at most one in-flight page per pooled driver
+    semaphore = asyncio.Semaphore(DRIVER_POOL.size)
+
+    async def collect_limited(ipo, client):
+        async with semaphore:
+            return await collect_ipo_data_async(ipo, client)
+
+    async with httpx.AsyncClient(http2=True, headers=HTTP_HEADERS, timeout=HTTP_TIMEOUT, follow_redirects=True) as client:
+        results = await asyncio.gather(
+            *[collect_limited(ipo, client) for ipo in ipos],
+            return_exceptions=True
+        )
+
+    ipo_texts = {}
+    for index, (ipo, result) in enumerate(zip(ipos, results)):
+        if isinstance(result, Exception):
+            print(f"Error collecting data for {ipo['name']}: {result}")
+        elif result:
+            ipo_texts[index] = result
+
+    analyses = [None] * len(ipos)
+    batch_analyses = await get_ipo_analysis_batch(list(ipo_texts.values()))
+    for index, analysis in zip(ipo_texts, batch_analyses):
+        analyses[index] = analysis
+    return analyses
+
+@lru_cache(maxsize=None)
+def get_langchain_llm():
+    """Builds the LangChain Gemini client once and reuses it (built lazily so a missing key doesn't break imports)."""
+    return ChatGoogleGenerativeAI(model = GEMINI_MODEL_NAME, google_api_key = os.getenv("GOOGLE_API_KEY"), temperature=0.4)
+
 def ipo_analysis_langchain():
-    llm = ChatGoogleGenerativeAI(model = "gemini-2.5-flash", google_api_key = os.getenv("GOOGLE_API_KEY"), temperature=0.4)
+    llm = get_langchain_llm()
     prompt_template = ChatPromptTemplate.from_template
     (
         """
@@ -210,6 +624,40 @@ def ipo_analysis_langchain():
     return analysis_chain
 
 
+# ==============================================================================
+# PARALLEL RUNNER (one worker per IPO, each checking out a pooled driver)
+# ==============================================================================
+def analyze_single_ipo(ipo):
+    """
+    Runs the full fetch -> parse -> analyze pipeline for one IPO.
+    Returns (analysis, error_message); exactly one of them is None.
+    """
+    html_content = asyncio.run(fetch_page_source(ipo['url']))
+    if not html_content:
+        return None, "Could not retrieve the detail page HTML."
+
+    aggregated_data = parse_and_aggregate_data(html_content)
+    if not aggregated_data:
+        return None, "Could not parse data from the detail page. It may be a placeholder page."
+
+    return get_ipo_analysis_with_gemini(aggregated_data), None
+
+def print_ipo_analyses(type_label, ipos, results):
+    """Prints the analyses for one group of IPOs in their original order."""
+    for ipo, (ipo_analysis, error) in zip(ipos, results):
+        print(f"\n\nANALYSIS FOR {type_label} IPO: {ipo['name'].upper()}")
+        print("-" * 50)
+
+        if error:
+            print(error)
+            continue
+
+        print("\n" + "#"*80)
+        print(f"          GEMINI-GENERATED ANALYSIS FOR {type_label} IPO: {ipo['name'].upper()}")
+        print("#"*80 + "\n")
+        print(ipo_analysis)
+
+
 # ==============================================================================
 # THE MAIN ENGINE (The "Conductor")
 # ==============================================================================
@@ -219,66 +667,26 @@ if __name__ == "__main__":
     if not current_ipos and not upcoming_ipos:
         print("\nNo current or upcoming IPOs found to analyze. Exiting.")
     else:
-        # Analyze Current IPOs
-        if current_ipos:
-            print("\n" + "="*80)
-            print(f"Starting analysis for {len(current_ipos)} CURRENT IPO(s).")
-            print("="*80)
-
-            for ipo in current_ipos:
-                print(f"\n\nANALYZING CURRENT IPO: {ipo['name'].upper()}")
-                print("-" * 50)
-                
-                html_content = get_page_source_with_selenium(ipo['url'])
-
-                if html_content:
-                    aggregated_data = parse_and_aggregate_data(html_content)
-                    
-                    if aggregated_data:
-                        ipo_analysis = get_ipo_analysis_with_gemini(aggregated_data)
-                        
-                        print("\n" + "#"*80)
-                        print(f"          GEMINI-GENERATED ANALYSIS FOR CURRENT IPO: {ipo['name'].upper()}")
-                        print("#"*80 + "\n")
-                        print(ipo_analysis)
-                    else:
-                        print("Could not parse data from the detail page. It may be a placeholder page.")
-                else:
-                    print("Could not retrieve the detail page HTML.")
-                
-                print("\n--- Pausing for 5 seconds before next IPO ---")
-                time.sleep(5)
-        else:
-            print("\nNo current IPOs found to analyze.")
-
-        # Analyze Upcoming IPOs
-        if upcoming_ipos:
-            print("\n\n" + "="*80)
-            print(f"Starting analysis for {len(upcoming_ipos)} UPCOMING IPO(s).")
-            print("="*80)
-
-            for ipo in upcoming_ipos:
-                print(f"\n\nANALYZING UPCOMING IPO: {ipo['name'].upper()}")
-                print("-" * 50)
-                
-                html_content = get_page_source_with_selenium(ipo['url'])
-
-                if html_content:
-                    aggregated_data = parse_and_aggregate_data(html_content)
-                    
-                    if aggregated_data:
-                        ipo_analysis = get_ipo_analysis_with_gemini(aggregated_data)
-                        
-                        print("\n" + "#"*80)
-                        print(f"          GEMINI-GENERATED ANALYSIS FOR UPCOMING IPO: {ipo['name'].upper()}")
-                        print("#"*80 + "\n")
-                        print(ipo_analysis)
-                    else:
-                        print("Could not parse data from the detail page. It may be a placeholder page.")
-                else:
-                    print("Could not retrieve the detail page HTML.")
-                
-                print("\n--- Pausing for 5 seconds before next IPO ---")
-                time.sleep(5)
-        else:
-            print("\nNo upcoming IPOs found to analyze.")
\ No newline at end of file
+        # One worker per pooled driver (for the Selenium fallback): the pool size
+        # is also our politeness limit towards the site, so no per-IPO sleep is needed.
+        with ThreadPoolExecutor(max_workers=DRIVER_POOL.size) as executor:
+            current_futures = [executor.submit(analyze_single_ipo, ipo) for ipo in current_ipos]
+            upcoming_futures = [executor.submit(analyze_single_ipo, ipo) for ipo in upcoming_ipos]
+
+            # Analyze Current IPOs
+            if current_ipos:
+                print("\n" + "="*80)
+                print(f"Starting analysis for {len(current_ipos)} CURRENT IPO(s).")
+                print("="*80)
+                print_ipo_analyses("CURRENT", current_ipos, [future.result() for future in current_futures])
+            else:
+                print("\nNo current IPOs found to analyze.")
+
+            # Analyze Upcoming IPOs
+            if upcoming_ipos:
+                print("\n\n" + "="*80)
+                print(f"Starting analysis for {len(upcoming_ipos)} UPCOMING IPO(s).")
+                print("="*80)
+                print_ipo_analyses("UPCOMING", upcoming_ipos, [future.result() for future in upcoming_futures])
+            else:
+                print("\nNo upcoming IPOs found to analyze.")